@@ -1,7 +1,14 @@
 """ App package. """
 import logging
+from typing import TYPE_CHECKING
 from .config import Config
-from .file_system import FileSystem
+
+# The modules are imported by the factories, so the text extraction workers
+# which run in this package do not load them
+if TYPE_CHECKING:
+    from .prefetch import Prefetcher
+    from .roots import FileSystemRoots
+    from .text_extraction import TextExtractionPool
 
 def init_logger(config:Config):
     """
@@ -29,12 +36,29 @@ def init_logger(config:Config):
     log.info("Logger initialized")
     return log
 
-def get_file_system_client(config:Config, log:logging.Logger) -> FileSystem:
+def get_file_system_client(config:Config, log:logging.Logger) -> "FileSystemRoots":
     """
-    Get FileSystem instance.
+    Get FileSystemRoots instance.
     """
+    from .roots import FileSystemRoots
 
-    if not config.file_system_path:
+    if not config.file_system_path and not config.file_system_roots:
         raise ValueError("File system path is not set in the config")
 
-    return FileSystem(config, log)
\ No newline at end of file
+    return FileSystemRoots(config, log)
+
+def get_text_extraction_pool(config:Config, log:logging.Logger) -> "TextExtractionPool":
+    """
+    Get TextExtractionPool instance.
+    """
+    from .text_extraction import TextExtractionPool
+    return TextExtractionPool(config, log)
+
+
+def get_prefetcher(config:Config, log:logging.Logger, file_system_client:"FileSystemRoots",
+                   text_extraction_pool:"TextExtractionPool") -> "Prefetcher":
+    """
+    Get Prefetcher instance.
+    """
+    from .prefetch import Prefetcher
+    return Prefetcher(config, log, file_system_client, text_extraction_pool)
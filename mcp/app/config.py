@@ -1,9 +1,24 @@
 """ Config class """
+import copy
 import logging
 import os
+import re
 import sys
 from dotenv import load_dotenv
 
+# Options which can be set per root with ROOT_<NAME>_<OPTION> variables
+ROOT_OPTIONS = [
+    "max_scan_items",
+    "max_return_file_size",
+    "max_read_file_size",
+    "exclude_folders",
+    "ignore_files_exp",
+    "ignore_folders_exp",
+    "max_io_threads",
+]
+
+ROOT_NAME_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
 class Config:
     """
     Configuration class for the application. For new features, please add 
@@ -14,6 +29,9 @@ class Config:
 
         # config keys
         self.file_system_path = ""
+        # Named roots as "name=path" items. If set, file_system_path is not used
+        # and paths are given as "name:/dir"
+        self.file_system_roots: list[str] = []
 
         self.log_destination = ""
         self.log_level = ""
@@ -30,6 +48,34 @@ class Config:
         self.ignore_files_exp: str = ""
         # Expression to ignore certain folders by a name
         self.ignore_folders_exp: str = ""
+        # Folder to keep server state (change feed snapshots). Empty means ~/.nasuni_mcp/state
+        self.state_folder: str = ""
+        # Max number of change feed snapshots to keep per tracked path
+        self.max_change_snapshots: int = 20
+        # Max number of files to keep detected content types for
+        self.content_type_cache_size: int = 10000
+        # Number of worker processes for text extraction. 0 means extract in the server process
+        self.text_extraction_workers: int = 2
+        # Max time of a text extraction, in seconds
+        self.text_extraction_timeout: int = 60
+        # Max memory of a text extraction worker process (not supported on Windows)
+        self.text_extraction_memory_limit: int = 1024 * 1024 * 1024  # 1 GB
+        # Max number of concurrent I/O operations on a root
+        self.max_io_threads: int = 4
+        # Prefetch likely next reads in the background after a folder listing
+        self.prefetch_enabled: bool = False
+        # Max size of prefetched data kept in memory, also the max bytes read per listing
+        self.prefetch_max_bytes: int = 16 * 1024 * 1024  # 16 MB
+        # Max size of a file whose contents are prefetched
+        self.prefetch_small_file_size: int = 64 * 1024  # 64 KB
+        # Max number of subfolders and of small files prefetched per listing
+        self.prefetch_max_items: int = 10
+        # Max number of PDF/DOCX files whose text is prefetched per listing
+        self.prefetch_max_text_files: int = 2
+        # Number of concurrent prefetch operations
+        self.prefetch_workers: int = 2
+        # Time a prefetched item is kept, in seconds
+        self.prefetch_ttl: int = 120
 
         self._set_values(env_file_path)
 
@@ -49,6 +95,33 @@ class Config:
         # remove trailing slashes for each value in exclude_folders
         self.exclude_folders = [folder.rstrip("/") for folder in self.exclude_folders]
 
+    def get_roots(self) -> dict[str, str]:
+        """
+        Get the named roots as a map of a root name to its path.
+        """
+        roots = {}
+        for root in self.file_system_roots:
+            name, separator, path = root.partition("=")
+            name = name.strip()
+            if not separator or not ROOT_NAME_PATTERN.fullmatch(name) or not path.strip():
+                raise ValueError(f"Invalid root: {root}. Expected format is name=path")
+            if name in roots:
+                raise ValueError(f"Duplicate root name: {name}")
+            roots[name] = path.strip()
+        return roots
+
+    def for_root(self, name: str, path: str) -> "Config":
+        """
+        Get the configuration of a named root. Values of ROOT_OPTIONS can be overwritten
+        with ROOT_<NAME>_<OPTION> environment variables.
+        """
+        root_config = copy.copy(self)
+        root_config.file_system_path = path
+        root_config.file_system_roots = []
+        root_config._parse_env(f"ROOT_{name.upper().replace('-', '_')}_", ROOT_OPTIONS)
+        root_config.exclude_folders = [folder.rstrip("/") for folder in root_config.exclude_folders]
+        return root_config
+
     def _merge_command_line_args(self):
         """
         Merge command line arguments into the configuration.
@@ -96,12 +169,14 @@ class Config:
             return logging.CRITICAL
         return logging.NOTSET
 
-    def _parse_env(self) -> None:
+    def _parse_env(self, prefix: str = "", attrs: list[str] | None = None) -> None:
         """
             Set values from ENV. Overwrite values for config
         """
-        for attr, current_value in vars(self).items():
-            env_value = os.environ.get(attr.upper())
+        for attr, current_value in list(vars(self).items()):
+            if attrs is not None and attr not in attrs:
+                continue
+            env_value = os.environ.get(prefix + attr.upper())
 
             if env_value is not None and env_value != "":
                 # Convert string environment values to appropriate types
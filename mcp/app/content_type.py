@@ -0,0 +1,188 @@
+"""Content type detection by file header."""
+from collections import OrderedDict
+from enum import Enum
+from typing import BinaryIO
+import io
+import os
+import struct
+import threading
+import zipfile
+
+# Number of bytes read from the beginning of a file to detect its type
+HEADER_SIZE = 512
+# Max number of leading bytes allowed before the PDF signature
+_PDF_MAX_OFFSET = 16
+
+class ContentType(Enum):
+    """Enum for detected file content types"""
+    PNG = "png"
+    JPEG = "jpeg"
+    GIF = "gif"
+    PDF = "pdf"
+    DOCX = "docx"
+    ZIP = "zip"
+    TEXT = "text"
+    BINARY = "binary"
+
+IMAGE_TYPES = (ContentType.PNG, ContentType.JPEG)
+TEXT_EXTRACTION_TYPES = (ContentType.PDF, ContentType.DOCX, ContentType.TEXT)
+
+_EXTENSION_TYPES = {
+    ".png": ContentType.PNG,
+    ".jpg": ContentType.JPEG,
+    ".jpeg": ContentType.JPEG,
+    ".gif": ContentType.GIF,
+    ".pdf": ContentType.PDF,
+    ".docx": ContentType.DOCX,
+    ".zip": ContentType.ZIP,
+    ".xlsx": ContentType.ZIP,
+    ".pptx": ContentType.ZIP,
+    ".txt": ContentType.TEXT,
+    ".md": ContentType.TEXT,
+    ".csv": ContentType.TEXT,
+    ".json": ContentType.TEXT,
+    ".xml": ContentType.TEXT,
+    ".html": ContentType.TEXT,
+    ".htm": ContentType.TEXT,
+    ".log": ContentType.TEXT,
+    ".yaml": ContentType.TEXT,
+    ".yml": ContentType.TEXT,
+    ".ini": ContentType.TEXT,
+}
+
+def guess_content_type(name: str) -> ContentType | None:
+    """
+    Guess the content type by the file extension. Returns None if the extension is not known.
+    """
+    return _EXTENSION_TYPES.get(os.path.splitext(name)[1].lower())
+
+def detect_content_type(header: bytes, file: BinaryIO | None = None) -> ContentType:
+    """
+    Detect the content type by the first bytes of a file (magic numbers).
+    ZIP files are told from DOCX by the name of the first member. For Office packages
+    which start with [Content_Types].xml the archive directory is read from the file, if given.
+    """
+    header = header[:HEADER_SIZE]
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ContentType.PNG
+    if header.startswith(b"\xff\xd8\xff"):
+        return ContentType.JPEG
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return ContentType.GIF
+    if _is_pdf(header):
+        return ContentType.PDF
+    if header.startswith(b"PK\x05\x06"):
+        # an empty archive
+        return ContentType.ZIP
+    if header.startswith(b"PK\x03\x04"):
+        first_member = _zip_first_member_name(header)
+        if first_member.startswith(b"word/"):
+            return ContentType.DOCX
+        if first_member == b"[Content_Types].xml" and file is not None and _is_docx_package(file):
+            return ContentType.DOCX
+        return ContentType.ZIP
+    if _looks_like_text(header):
+        return ContentType.TEXT
+    return ContentType.BINARY
+
+def image_format(content_type: ContentType) -> str:
+    """
+    Get the image format name for a content type. Raises an error if it is not a supported image.
+    """
+    if content_type == ContentType.PNG:
+        return "png"
+    if content_type == ContentType.JPEG:
+        return "jpg"
+    raise ValueError(f"Unsupported image format: {content_type.value}")
+
+def _is_pdf(header: bytes) -> bool:
+    """
+    Check if the data starts with the PDF signature. A few bytes of leading whitespace
+    or binary junk are allowed, but not text.
+    """
+    position = header.find(b"%PDF-", 0, _PDF_MAX_OFFSET + 5)
+    if position < 0:
+        return False
+    prefix = header[:position]
+    return not prefix.strip() or any(byte < 0x09 or byte >= 0x80 for byte in prefix)
+
+def _zip_first_member_name(header: bytes) -> bytes:
+    """
+    Get the name of the first member from the local file header of a ZIP file.
+    """
+    if len(header) < 30:
+        return b""
+    name_length = struct.unpack_from("<H", header, 26)[0]
+    return header[30:30 + name_length]
+
+def _is_docx_package(file: BinaryIO) -> bool:
+    """
+    Check if a ZIP file is a Word document by its archive directory.
+    """
+    try:
+        with zipfile.ZipFile(file) as archive:
+            archive.getinfo("word/document.xml")
+            return True
+    except (zipfile.BadZipFile, KeyError, OSError):
+        return False
+
+def _looks_like_text(header: bytes) -> bool:
+    """
+    Check if the data looks like a text. UTF-8 is accepted as is; for other encodings
+    only a few control characters are allowed.
+    """
+    if b"\x00" in header:
+        return False
+    try:
+        header.decode("utf-8")
+        return True
+    except UnicodeDecodeError as e:
+        # a multibyte character can be cut at the end of the header
+        if e.start >= len(header) - 3 and e.reason == "unexpected end of data":
+            return True
+    control_chars = sum(1 for byte in header if byte < 0x20 and byte not in b"\t\n\r\f\b\x1b")
+    return control_chars <= len(header) // 20
+
+class ContentTypeDetector:
+    """
+    Detects content types of files by reading their headers.
+    Results are cached by the file path, size and mtime.
+    """
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, tuple[int, float, ContentType]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cached(self, full_path: str, size: int, mtime: float) -> ContentType | None:
+        """
+        Get the cached content type of a file without reading it.
+        """
+        with self._lock:
+            cached = self._cache.get(full_path)
+            if cached is None or cached[0] != size or cached[1] != mtime:
+                return None
+            self._cache.move_to_end(full_path)
+            return cached[2]
+
+    def detect(self, full_path: str, size: int, mtime: float, contents: bytes | None = None) -> ContentType:
+        """
+        Get the content type of a file. Only the header of the file is read (and the archive
+        directory of Office packages), or the given contents are used if the file was already read.
+        """
+        content_type = self.cached(full_path, size, mtime)
+        if content_type is not None:
+            return content_type
+
+        if contents is not None:
+            content_type = detect_content_type(contents[:HEADER_SIZE], io.BytesIO(contents))
+        else:
+            with open(full_path, "rb") as f:
+                content_type = detect_content_type(f.read(HEADER_SIZE), f)
+
+        with self._lock:
+            self._cache[full_path] = (size, mtime, content_type)
+            self._cache.move_to_end(full_path)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return content_type
@@ -1,13 +1,25 @@
 """File system utilities."""
 from html import parser
 from enum import Enum
+from typing import Callable, Iterator
+import fnmatch
+import io
+import heapq
+import itertools
 import logging
 import os
+import zipfile
+from datetime import datetime
 from hachoir.parser import createParser
 from hachoir.metadata import extractMetadata
 
 from .config import Config
-from .models import FolderContents, FileSystemItem, FolderItem, FileItem, FileMetadata
+from .content_type import ContentType, ContentTypeDetector, image_format
+from .models import ArchiveContents, ArchiveMember, FolderChanges, FolderContents, FileSystemItem, FolderItem, FileItem, FileMetadata
+from .prefetch import PrefetchCache
+from .snapshots import SnapshotStore
+from .timestamps import parse_timestamp
+
 
 class SizeLimitKind(Enum):
     """Enum for file size limits kinds"""
@@ -15,22 +27,95 @@ class SizeLimitKind(Enum):
     RETURN = "return"
     NONE = "none"
 
+class SortBy(Enum):
+    """Enum for folder contents sort keys"""
+    NAME = "name"
+    SIZE = "size"
+    MTIME = "mtime"
+
+def _sort_key(sort_by: SortBy) -> Callable[[FileSystemItem], tuple]:
+    """
+    Build a sort key for file items. The name is used as a tie breaker.
+    """
+    if sort_by == SortBy.SIZE:
+        return lambda item: (item.file.size, item.file.name.lower())
+    if sort_by == SortBy.MTIME:
+        return lambda item: (item.file.modified or 0, item.file.name.lower())
+    return lambda item: (item.file.name.lower(), item.file.name)
+
+def _snapshot_files(folders: dict) -> dict[str, tuple[int, float]]:
+    """
+    Flatten a snapshot to a map of file path to (size, mtime).
+    """
+    files = {}
+    for folder, snapshot in folders.items():
+        prefix = folder + "/" if folder else ""
+        for name, (size, mtime) in snapshot["files"].items():
+            files[prefix + name] = (size, mtime)
+    return files
+
+def _zip_time_to_timestamp(date_time: tuple) -> float | None:
+    """
+    Convert a ZIP member date/time tuple (local time) to a Unix timestamp.
+    """
+    try:
+        return datetime(*date_time).timestamp()
+    except ValueError:
+        return None
+
+def _revert_snapshot_changes(folders: dict, previous: dict | None, paths: list[str]) -> dict:
+    """
+    Build a copy of a snapshot where the given files have their state from the previous snapshot.
+    Without a previous snapshot (timestamp mode) the files are kept with no mtime, so the next
+    call reports them as modified. The folders of these files get no mtime, so they are listed
+    again by the next refresh.
+    """
+    folders = {folder: dict(snapshot, files=dict(snapshot["files"])) for folder, snapshot in folders.items()}
+    for path in paths:
+        folder, _, name = path.rpartition("/")
+        snapshot = folders.setdefault(folder, {"mtime": None, "files": {}, "subfolders": []})
+        snapshot["mtime"] = None
+        if previous is None:
+            if name in snapshot["files"]:
+                snapshot["files"][name] = [snapshot["files"][name][0], None]
+            continue
+        previous_file = previous.get(folder, {}).get("files", {}).get(name)
+        if previous_file is None:
+            snapshot["files"].pop(name, None)
+        else:
+            snapshot["files"][name] = previous_file
+    return folders
+
 class FileSystem:
     """
     Represents the file system and provides methods to interact with it.
     """
 
-    def __init__(self, config: Config, log: logging.Logger | None = None):
+    def __init__(self, config: Config, log: logging.Logger | None = None, root_name: str = "",
+                 prefetch_cache: PrefetchCache | None = None):
         self.config = config
+        self.root_name = root_name
+        self.prefetch_cache = prefetch_cache
+        self.snapshots = SnapshotStore(config)
+        self.content_types = ContentTypeDetector(config.content_type_cache_size)
         if log is not None:
             self.log = log
         else:
             self.log = logging.getLogger("null")
             self.log.addHandler(logging.NullHandler())
 
-    def folder_contents(self, relative_path, scan_limit: int | None = None) -> FolderContents:
+    def folder_contents(self, relative_path, scan_limit: int | None = None,
+                        sort_by: SortBy | None = None, descending: bool = False,
+                        name_glob: str = "", min_size: int = 0,
+                        modified_since: float | None = None,
+                        limit: int | None = None) -> FolderContents:
         """
         Get the contents of a folder.
+        Without sorting or filtering the first scanned items are returned in the scan order.
+        If any of sort_by, name_glob, min_size, modified_since or limit is given, the whole folder
+        is scanned and files are selected in a streaming pass, keeping only the best `limit`
+        matches (defaults to and is capped by the scan limit) in memory. Filters apply to files
+        only, subfolders are collected up to the scan limit.
         """
 
         if relative_path == "/" or relative_path == "\\":
@@ -45,9 +130,68 @@ class FileSystem:
         if relative_path.endswith("/"):
             folder_name = os.path.basename(os.path.dirname(relative_path))
 
-        contents = FolderContents(folder=FolderItem(name=folder_name, path=relative_path))
+        contents = FolderContents(folder=FolderItem(name=folder_name, path=self._public_path(relative_path)))
+
+        selecting = (sort_by is not None or name_glob != "" or min_size > 0
+                     or modified_since is not None or limit is not None)
+
+        if not selecting:
+            items : list[FileSystemItem] = []
+            for item in self._scan_folder(relative_path, folder_path):
+                items.append(item)
 
-        items : list[FileSystemItem] = []
+                if scan_first_items and len(items) >= scan_first_items:
+                    break
+
+            contents.load_contents(items)
+            return contents
+
+        subfolders: list[FileSystemItem] = []
+        name_pattern = name_glob.lower()
+
+        def matching_files():
+            for item in self._scan_folder(relative_path, folder_path):
+                if item.is_folder:
+                    if not scan_first_items or len(subfolders) < scan_first_items:
+                        subfolders.append(item)
+                    continue
+                file = item.file
+                if name_pattern and not fnmatch.fnmatchcase(file.name.lower(), name_pattern):
+                    continue
+                if min_size and file.size < min_size:
+                    continue
+                if modified_since is not None and (file.modified or 0) < modified_since:
+                    continue
+                yield item
+
+        select_count = limit if limit is not None else scan_first_items
+        if scan_first_items and select_count:
+            select_count = min(select_count, scan_first_items)
+
+        if sort_by is None:
+            # keep scanning after the files are selected, so the subfolders are still listed
+            files = []
+            for item in matching_files():
+                if not select_count or len(files) < select_count:
+                    files.append(item)
+                elif scan_first_items and len(subfolders) >= scan_first_items:
+                    break
+        else:
+            key = _sort_key(sort_by)
+            if not select_count:
+                files = sorted(matching_files(), key=key, reverse=descending)
+            elif descending:
+                files = heapq.nlargest(select_count, matching_files(), key=key)
+            else:
+                files = heapq.nsmallest(select_count, matching_files(), key=key)
+
+        contents.load_contents(subfolders + files)
+        return contents
+
+    def _scan_folder(self, relative_path: str, folder_path: str) -> Iterator[FileSystemItem]:
+        """
+        Iterate over the items of a folder, skipping excluded folders.
+        """
         for entry in os.scandir(folder_path):
             item_path = relative_path
 
@@ -61,23 +205,137 @@ class FileSystem:
                 absolute_item_path = self._build_path(item_path)
                 if self._check_path_is_in_excluded_folder(absolute_item_path):
                     continue
-                item = FolderItem(name=entry.name, path=item_path)
+                item = FolderItem(name=entry.name, path=self._public_path(item_path))
             else:
+                stat = entry.stat()
                 item = FileItem(
                     name=entry.name,
-                    path=item_path,
-                    size=entry.stat().st_size)
+                    path=self._public_path(item_path),
+                    size=stat.st_size,
+                    modified=stat.st_mtime,
+                    detected_type=self.content_types.cached(os.path.abspath(entry.path), stat.st_size, stat.st_mtime))
                 if self.config.max_return_file_size:
                     item.define_if_is_too_large(self.config.max_return_file_size)
 
-            items.append(FileSystemItem(item=item))
+            yield FileSystemItem(item=item)
 
-            if scan_first_items and len(items) >= scan_first_items:
-                break
+    def changes_since(self, relative_path: str, since: str = "", full_rescan: bool = False) -> FolderChanges:
+        """
+        Get files created, modified or deleted in a folder tree since a previous call.
+        `since` is a token returned by a previous call, a timestamp, or empty to start tracking.
+        With a token, folders whose mtime did not change are not listed again and their files are
+        taken from the previous snapshot. full_rescan disables this pruning.
+        With a timestamp there is no previous snapshot, so all files modified at or after it are
+        reported as modified and deletions are not known.
+        """
+        relative_path = relative_path.strip("/\\")
+        folder_path = self._build_path(relative_path)
+        self._require_path_is_in_excluded_folder(folder_path)
+
+        if not os.path.isdir(folder_path):
+            raise ValueError("Path is not a directory")
+
+        previous = None
+        modified_since = None
+        if since and self.snapshots.is_token(since):
+            previous = self.snapshots.load(since)
+            if previous["path"] != self._public_path(relative_path):
+                raise ValueError(f"Token was issued for another path: '{previous['path']}'")
+        elif since:
+            modified_since = parse_timestamp(since)
+
+        folders = self._refresh_snapshot(relative_path, previous["folders"] if previous else None, full_rescan)
+
+        changes = FolderChanges(folder=FolderItem(name=os.path.basename(relative_path),
+                                                  path=self._public_path(relative_path)),
+                                token="")
+        if not since:
+            changes.token = self.snapshots.save({"path": self._public_path(relative_path), "folders": folders})
+            return changes
+
+        current_files = _snapshot_files(folders)
+        previous_files = _snapshot_files(previous["folders"]) if previous else {}
+
+        created, modified = [], []
+        for path, (size, mtime) in sorted(current_files.items()):
+            if previous is None:
+                if mtime < modified_since:
+                    continue
+                modified.append(path)
+            elif path not in previous_files:
+                created.append(path)
+            elif previous_files[path] != (size, mtime):
+                modified.append(path)
+        deleted = sorted(path for path in previous_files if path not in current_files)
+
+        limit = self.config.max_scan_items
+        if limit and len(created) + len(modified) + len(deleted) > limit:
+            changes.is_truncated = True
+            undelivered = created[limit:]
+            created = created[:limit]
+            undelivered += modified[limit - len(created):]
+            modified = modified[:limit - len(created)]
+            undelivered += deleted[limit - len(created) - len(modified):]
+            deleted = deleted[:limit - len(created) - len(modified)]
+            # the saved snapshot must contain only the delivered changes,
+            # so that the rest is reported by the next call
+            folders = _revert_snapshot_changes(folders, previous["folders"] if previous else None, undelivered)
+
+        changes.token = self.snapshots.save({"path": self._public_path(relative_path), "folders": folders})
+
+        for paths, target in ((created, changes.created), (modified, changes.modified)):
+            for path in paths:
+                size, mtime = current_files[path]
+                item = FileItem(name=path.rsplit("/", 1)[-1], path=self._public_path(path), size=size, modified=mtime)
+                if self.config.max_return_file_size:
+                    item.define_if_is_too_large(self.config.max_return_file_size)
+                target.append(item)
+        changes.deleted = [self._public_path(path) for path in deleted]
+
+        return changes
+
+    def _refresh_snapshot(self, relative_path: str, previous: dict | None, full_rescan: bool) -> dict:
+        """
+        Walk the folder tree and build a snapshot of it.
+        Folders with the same mtime as in the previous snapshot are not listed again.
+        """
+        folders = {}
+        stack = [relative_path]
+        while stack:
+            folder = stack.pop()
+            folder_path = self._build_path(folder)
+            if folder != relative_path and self._check_path_is_in_excluded_folder(folder_path):
+                continue
+            try:
+                mtime = os.stat(folder_path).st_mtime
+            except FileNotFoundError:
+                continue
+
+            known = previous.get(folder) if previous else None
+            if known and not full_rescan and known["mtime"] == mtime:
+                snapshot = dict(known)
+            else:
+                snapshot = {"mtime": mtime, "files": {}, "subfolders": []}
+                try:
+                    entries = list(os.scandir(folder_path))
+                except FileNotFoundError:
+                    continue
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            snapshot["subfolders"].append(entry.name)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            snapshot["files"][entry.name] = [stat.st_size, stat.st_mtime]
+                    except FileNotFoundError:
+                        continue
+
+            folders[folder] = snapshot
+            prefix = folder + "/" if folder else ""
+            stack.extend(prefix + name for name in snapshot["subfolders"])
+
+        return folders
 
-        contents.load_contents(items)
-        return contents
-    
     def get_metadata(self, path: str) -> FileMetadata:
         """
         Get the metadata of a file.
@@ -94,8 +352,10 @@ class FileSystem:
 
         item = FileItem(
             name=os.path.basename(path),
-            path=path,
-            size=stat.st_size
+            path=self._public_path(path),
+            size=stat.st_size,
+            modified=stat.st_mtime,
+            detected_type=self.content_types.detect(full_path, stat.st_size, stat.st_mtime)
         )
         if self.config.max_return_file_size:
             item.define_if_is_too_large(self.config.max_return_file_size)
@@ -126,8 +386,7 @@ class FileSystem:
         
         self._require_path_is_in_excluded_folder(full_path)
 
-        with open(full_path, "rb") as f:
-            return f.read()
+        return self._read_file(full_path)
 
     def get_file_content_as_string(self, path: str, size_limit_kind: SizeLimitKind = SizeLimitKind.RETURN) -> str:
         """
@@ -138,33 +397,205 @@ class FileSystem:
         self._check_file_size_is_not_too_large(full_path, size_limit_kind)
         self._require_path_is_in_excluded_folder(full_path)
 
-        with open(full_path, "r", encoding="utf-8", errors='replace') as f:
+        # only the header is read to reject binary files
+        content_type = self._detect_content_type(full_path)
+        if content_type != ContentType.TEXT:
+            raise ValueError(f"File {path} is not a text file (detected type: {content_type.value}).")
+
+        # decoded as a text file would be read, with universal newlines
+        with io.TextIOWrapper(io.BytesIO(self._read_file(full_path)), encoding="utf-8", errors='replace') as f:
+            return f.read()
+
+    def get_prefetched_text(self, path: str) -> str | None:
+        """
+        Get the text extracted from a file by the prefetcher, if it is still valid.
+        """
+        if self.prefetch_cache is None:
+            return None
+        full_path = self._build_path(path)
+        self._require_path_is_in_excluded_folder(full_path)
+        stat = os.stat(full_path)
+        return self.prefetch_cache.get("text", full_path, (stat.st_size, stat.st_mtime))
+
+    def prefetch_folder_contents(self, path: str) -> None:
+        """
+        Scan the first items of a folder to warm the directory cache of the file system.
+        The listing itself is not cached, a later folder_contents call always scans the folder,
+        so it never returns sizes or times of files changed in the meantime.
+        """
+        folder_path = self._build_path(path)
+        self._require_path_is_in_excluded_folder(folder_path)
+        for _ in itertools.islice(self._scan_folder(path, folder_path), self.config.max_scan_items or None):
+            pass
+
+    def prefetch_file(self, path: str) -> None:
+        """
+        Load a small file to the prefetch cache and detect its content type.
+        """
+        full_path = self._build_path(path)
+        self._require_path_is_in_excluded_folder(full_path)
+        stat = os.stat(full_path)
+        version = (stat.st_size, stat.st_mtime)
+        if stat.st_size > self.config.prefetch_small_file_size or self.prefetch_cache.contains("file", full_path, version):
+            return
+        with open(full_path, "rb") as f:
+            contents = f.read(self.config.prefetch_small_file_size + 1)
+        if len(contents) != stat.st_size:
+            # the file was changed while reading
+            return
+        self.content_types.detect(full_path, stat.st_size, stat.st_mtime, contents)
+        self.prefetch_cache.put("file", full_path, version, contents, len(contents))
+
+    def prefetch_text_source(self, path: str) -> tuple[str, tuple[int, float], bytes, ContentType] | None:
+        """
+        Read a document to extract its text for the prefetch cache.
+        Returns None if the text is already cached or can not be extracted.
+        """
+        full_path = self._build_path(path)
+        self._require_path_is_in_excluded_folder(full_path)
+        stat = os.stat(full_path)
+        version = (stat.st_size, stat.st_mtime)
+        if self.prefetch_cache.contains("text", full_path, version):
+            return None
+        if self.config.max_read_file_size and stat.st_size > self.config.max_read_file_size:
+            return None
+        content_type = self.content_types.detect(full_path, stat.st_size, stat.st_mtime)
+        if content_type not in (ContentType.PDF, ContentType.DOCX):
+            return None
+        with open(full_path, "rb") as f:
+            return full_path, version, f.read(), content_type
+
+    def _read_file(self, full_path: str) -> bytes:
+        """
+        Read a file, using the prefetched contents if they are still valid.
+        Only files small enough to be prefetched are looked up, so the hit rate is not diluted.
+        """
+        if self.prefetch_cache is not None:
+            stat = os.stat(full_path)
+            if stat.st_size <= self.config.prefetch_small_file_size:
+                prefetched = self.prefetch_cache.get("file", full_path, (stat.st_size, stat.st_mtime))
+                if prefetched is not None:
+                    return prefetched
+
+        with open(full_path, "rb") as f:
             return f.read()
 
+    def archive_contents(self, path: str) -> ArchiveContents:
+        """
+        Get the list of members of a ZIP archive.
+        Only the central directory is read from the file, so the archive size is not limited.
+        """
+        full_path = self._build_path(path)
+        self._require_path_is_in_excluded_folder(full_path)
+
+        if os.path.isdir(full_path):
+            raise ValueError("Path is a directory")
+
+        stat = os.stat(full_path)
+        archive = FileItem(name=os.path.basename(path), path=self._public_path(path),
+                           size=stat.st_size, modified=stat.st_mtime)
+        if self.config.max_return_file_size:
+            archive.define_if_is_too_large(self.config.max_return_file_size)
+
+        contents = ArchiveContents(archive=archive)
+
+        with self._open_archive(full_path) as archive_file:
+            for info in archive_file.infolist():
+                if self.config.max_scan_items and len(contents.members) >= self.config.max_scan_items:
+                    contents.is_truncated = True
+                    break
+                member = ArchiveMember(
+                    name=info.filename,
+                    size=info.file_size,
+                    compressed_size=info.compress_size,
+                    modified=_zip_time_to_timestamp(info.date_time),
+                    is_folder=info.is_dir())
+                if self.config.max_return_file_size and info.file_size > self.config.max_return_file_size:
+                    member.is_too_large = True
+                contents.members.append(member)
+
+        return contents
+
+    def get_archive_member_content(self, path: str, member: str,
+                                   size_limit_kind: SizeLimitKind = SizeLimitKind.RETURN) -> bytes:
+        """
+        Get the content of a ZIP archive member as bytes.
+        Only the central directory and the member data are read from the file.
+        The size limit is applied to the uncompressed member size.
+        """
+        full_path = self._build_path(path)
+        self._require_path_is_in_excluded_folder(full_path)
+
+        if os.path.isdir(full_path):
+            raise ValueError("Path is a directory")
+
+        with self._open_archive(full_path) as archive_file:
+            try:
+                info = archive_file.getinfo(member)
+            except KeyError as e:
+                raise ValueError(f"Member {member} is not found in the archive.") from e
+
+            if info.is_dir():
+                raise ValueError("Member is a directory")
+
+            self._check_size_is_not_too_large(f"{full_path}:{member}", info.file_size, size_limit_kind)
+
+            try:
+                return archive_file.read(info)
+            except (RuntimeError, NotImplementedError, zipfile.BadZipFile) as e:
+                # encrypted or corrupted members, or unsupported compression methods
+                raise ValueError(f"Unable to read member {member}: {e}") from e
+
+    def _open_archive(self, full_path: str) -> zipfile.ZipFile:
+        """
+        Open a ZIP archive. Reads are done with seeks on the file, so only the needed parts are transferred.
+        """
+        try:
+            return zipfile.ZipFile(full_path, "r")
+        except zipfile.BadZipFile as e:
+            raise ValueError("File is not a ZIP archive") from e
+
     def get_image_file_format(self, path: str) -> str:
         """
-        Get the image file format from the file extension.
+        Get the image file format from the file header.
+        """
+        return image_format(self.get_content_type(path))
+
+    def get_content_type(self, path: str) -> ContentType:
+        """
+        Get the content type of a file. Only the file header is read, results are cached.
         """
-        ext = os.path.splitext(path)[1].lower()
-        if ext == ".png":
-            return "png"
-        elif ext in [".jpg", ".jpeg"]:
-            return "jpg"
-        raise ValueError(f"Unsupported image format: {ext}")
+        full_path = self._build_path(path)
+        self._require_path_is_in_excluded_folder(full_path)
+        return self._detect_content_type(full_path)
+
+    def _detect_content_type(self, full_path: str) -> ContentType:
+        """
+        Get the content type of a file by its absolute path.
+        """
+        if os.path.isdir(full_path):
+            raise ValueError("Path is a directory")
+        stat = os.stat(full_path)
+        return self.content_types.detect(full_path, stat.st_size, stat.st_mtime)
 
     def _check_file_size_is_not_too_large(self, full_path: str, size_limit_kind: SizeLimitKind = SizeLimitKind.RETURN):
         """
         Check if the file size is not too large.
         """
         stat = os.stat(full_path)
+        self._check_size_is_not_too_large(full_path, stat.st_size, size_limit_kind)
 
+    def _check_size_is_not_too_large(self, name: str, size: int, size_limit_kind: SizeLimitKind = SizeLimitKind.RETURN):
+        """
+        Check if the size of a file or an archive member is not too large.
+        """
         if size_limit_kind == SizeLimitKind.READ:
-            if self.config.max_read_file_size is not None and stat.st_size > self.config.max_read_file_size:
-                raise ValueError(f"File {full_path} is too large to download.")
+            if self.config.max_read_file_size is not None and size > self.config.max_read_file_size:
+                raise ValueError(f"File {name} is too large to download.")
 
         elif size_limit_kind == SizeLimitKind.RETURN:
-            if self.config.max_return_file_size is not None and stat.st_size > self.config.max_return_file_size:
-                raise ValueError(f"File {full_path} is too large to return.")
+            if self.config.max_return_file_size is not None and size > self.config.max_return_file_size:
+                raise ValueError(f"File {name} is too large to return.")
 
     def _require_path_is_in_excluded_folder(self, path: str):
         """
@@ -179,6 +610,14 @@ class FileSystem:
         """
         return any(path.startswith(excluded) for excluded in self.config.exclude_folders)
     
+    def _public_path(self, relative_path: str) -> str:
+        """
+        Build the path returned to clients. For a named root it is prefixed with the root name.
+        """
+        if not self.root_name:
+            return relative_path
+        return f"{self.root_name}:/{relative_path.lstrip('/')}"
+
     def _build_path(self, relative_path: str) -> str:
         """
         Build the absolute path for a given relative path.
@@ -1,7 +1,8 @@
 """ Models for representing file system items."""
-import os
 from pydantic import BaseModel, Field, computed_field
 
+from .content_type import ContentType, IMAGE_TYPES, guess_content_type
+
 class Item(BaseModel):
     """
     Represents a file or folder in the file system.
@@ -19,7 +20,19 @@ class FileItem(Item):
     Represents a file in the file system.
     """
     size: int = Field(description="Size of the file in bytes")
+    modified: float | None = Field(default=None, description="Last modification time of the file as a Unix timestamp")
     is_too_large: bool = Field(default=False, description="Whether the item is too large to download")
+    detected_type: ContentType | None = Field(default=None, exclude=True, description="Content type detected from the file header")
+
+    @computed_field
+    @property
+    def probable_type(self) -> str | None:
+        """
+        Content type of the file. Detected from the file header if it was read before,
+        else guessed by the file extension.
+        """
+        content_type = self.detected_type or guess_content_type(self.name)
+        return content_type.value if content_type else None
 
     @computed_field
     @property
@@ -27,8 +40,7 @@ class FileItem(Item):
         """
         Check if the file or folder is a supported image.
         """
-        ext = os.path.splitext(self.name)[1].lower()
-        return ext in [".png", ".jpg", ".jpeg"]
+        return self.probable_type in [t.value for t in IMAGE_TYPES]
 
     @computed_field
     @property
@@ -36,8 +48,7 @@ class FileItem(Item):
         """
         Check if the file or folder supports text extraction.
         """
-        ext = os.path.splitext(self.name)[1].lower()
-        return ext in [".pdf", ".docx"]
+        return self.probable_type in [ContentType.PDF.value, ContentType.DOCX.value]
 
     def define_if_is_too_large(self, max_size: int):
         """
@@ -113,3 +124,33 @@ class FolderContents(BaseModel):
                 self.subfolders.append(item.folder)
             else:
                 self.files.append(item.file)
+
+class FolderChanges(BaseModel):
+    """
+    Represents files created, modified or deleted in a folder tree since a previous snapshot.
+    """
+    folder: FolderItem = Field(description="The folder item")
+    token: str = Field(description="Token of the current snapshot. Pass it to the next call to get further changes")
+    created: list[FileItem] = Field(default=[], description="Files created since the previous snapshot")
+    modified: list[FileItem] = Field(default=[], description="Files modified since the previous snapshot")
+    deleted: list[str] = Field(default=[], description="Paths of files deleted since the previous snapshot")
+    is_truncated: bool = Field(default=False, description="Whether the lists were cut to the scan limit")
+
+class ArchiveMember(BaseModel):
+    """
+    Represents a member of an archive file.
+    """
+    name: str = Field(description="Full name of the member inside the archive. Names are delimited with '/'")
+    size: int = Field(description="Uncompressed size of the member in bytes")
+    compressed_size: int = Field(description="Compressed size of the member in bytes")
+    modified: float | None = Field(default=None, description="Last modification time of the member as a Unix timestamp")
+    is_folder: bool = Field(default=False, description="Whether the member is a folder")
+    is_too_large: bool = Field(default=False, description="Whether the member is too large to download")
+
+class ArchiveContents(BaseModel):
+    """
+    Represents the list of members of an archive file.
+    """
+    archive: FileItem = Field(description="The archive file item")
+    members: list[ArchiveMember] = Field(default=[], description="The members of the archive")
+    is_truncated: bool = Field(default=False, description="Whether the list was cut to the scan limit")
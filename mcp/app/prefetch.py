@@ -0,0 +1,209 @@
+"""Background prefetch of likely next reads after a folder listing."""
+import asyncio
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+from .config import Config
+from .content_type import ContentType
+from .models import FolderContents
+
+if TYPE_CHECKING:
+    from .roots import FileSystemRoots
+    from .text_extraction import TextExtractionPool
+
+# How often the prefetcher checks if the server is idle, in seconds
+_IDLE_POLL_INTERVAL = 0.05
+
+class PrefetchCache:
+    """
+    Cache of prefetched small file contents and extracted texts.
+    Entries are keyed by a kind and an absolute path and are valid only for the same
+    version of the file (size and mtime) and for a limited time.
+    The total size of the entries is limited, the oldest entries are evicted first.
+    """
+
+    def __init__(self, config: Config, log: logging.Logger):
+        self.config = config
+        self.log = log
+        self._entries: OrderedDict[tuple[str, str], tuple[Any, Any, int, float]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits: dict[str, int] = {}
+        self._misses: dict[str, int] = {}
+        self._prefetched: dict[str, int] = {}
+
+    def get(self, kind: str, full_path: str, version: Any) -> Any | None:
+        """
+        Get a prefetched value. Counts a hit or a miss for the kind.
+        """
+        with self._lock:
+            key = (kind, full_path)
+            entry = self._entries.get(key)
+            value = None
+            if entry is not None:
+                entry_version, entry_value, entry_size, expires = entry
+                if entry_version == version and expires > time.monotonic():
+                    value = entry_value
+                else:
+                    self._remove(key)
+
+            counters = self._hits if value is not None else self._misses
+            counters[kind] = counters.get(kind, 0) + 1
+        return value
+
+    def contains(self, kind: str, full_path: str, version: Any) -> bool:
+        """
+        Check if a valid value is cached, without counting a lookup.
+        """
+        with self._lock:
+            entry = self._entries.get((kind, full_path))
+            return entry is not None and entry[0] == version and entry[3] > time.monotonic()
+
+    def put(self, kind: str, full_path: str, version: Any, value: Any, size: int) -> None:
+        """
+        Store a prefetched value. Values larger than the whole cache are not stored.
+        """
+        if size > self.config.prefetch_max_bytes:
+            return
+        with self._lock:
+            key = (kind, full_path)
+            self._remove(key)
+            self._entries[key] = (version, value, size, time.monotonic() + self.config.prefetch_ttl)
+            self._size += size
+            self._prefetched[kind] = self._prefetched.get(kind, 0) + 1
+            while self._size > self.config.prefetch_max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """
+        Get the number of prefetched entries, hits, misses and the hit rate per kind.
+        """
+        stats = {}
+        with self._lock:
+            for kind in sorted(set(self._hits) | set(self._misses) | set(self._prefetched)):
+                hits = self._hits.get(kind, 0)
+                misses = self._misses.get(kind, 0)
+                stats[kind] = {
+                    "prefetched": self._prefetched.get(kind, 0),
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                }
+        return stats
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        """
+        Remove an entry if it exists. The lock must be held.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+class Prefetcher:
+    """
+    Warms the likely next reads after a folder listing: the directory cache of the subfolders,
+    the contents of small files and the extracted texts of the most recent PDF/DOCX files.
+    The work runs on the prefetch thread pools of the roots and only while no other file operation
+    is running. Text extraction uses a worker only if one is free and leaves one for other calls.
+    A new listing stops the prefetch scheduled for the previous one; operations already
+    started are finished, so no extraction worker is killed.
+    """
+
+    def __init__(self, config: Config, log: logging.Logger,
+                 file_system_client: "FileSystemRoots", text_extraction_pool: "TextExtractionPool"):
+        self.config = config
+        self.log = log
+        self.file_system_client = file_system_client
+        self.text_extraction_pool = text_extraction_pool
+        # Incremented by each listing, a prefetch of an older listing stops before its next job
+        self._generation = 0
+        self._tasks: set[asyncio.Task] = set()
+
+    def schedule(self, contents: FolderContents) -> None:
+        """
+        Schedule a prefetch of the items of a folder listing.
+        """
+        if not self.config.prefetch_enabled:
+            return
+
+        self._generation += 1
+        task = asyncio.get_running_loop().create_task(self._prefetch(contents, self._generation))
+        # keep a reference until the task is done, the loop holds only weak ones
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _prefetch(self, contents: FolderContents, generation: int) -> None:
+        """
+        Prefetch the items of a listing within the configured limits.
+        """
+        budget = self.config.prefetch_max_bytes
+        jobs: list[Callable[[], Awaitable[Any]]] = []
+
+        for folder in contents.subfolders[:self.config.prefetch_max_items]:
+            jobs.append(functools.partial(self._prefetch_call, folder.path, "prefetch_folder_contents"))
+
+        small_files = [file for file in contents.files if file.size <= self.config.prefetch_small_file_size]
+        for file in small_files[:self.config.prefetch_max_items]:
+            if file.size > budget:
+                continue
+            budget -= file.size
+            jobs.append(functools.partial(self._prefetch_call, file.path, "prefetch_file"))
+
+        documents = [file for file in contents.files
+                     if file.probable_type in (ContentType.PDF.value, ContentType.DOCX.value)]
+        documents.sort(key=lambda file: file.modified or 0, reverse=True)
+        for file in documents[:self.config.prefetch_max_text_files]:
+            if file.size > budget:
+                continue
+            budget -= file.size
+            jobs.append(functools.partial(self._prefetch_text, file.path, generation))
+
+        semaphore = asyncio.Semaphore(max(self.config.prefetch_workers, 1))
+
+        async def run(job):
+            async with semaphore:
+                await self._wait_until_idle()
+                if generation != self._generation:
+                    return
+                try:
+                    await job()
+                except Exception as e:
+                    self.log.debug("Prefetch failed: %s", e)
+
+        await asyncio.gather(*(run(job) for job in jobs))
+        self.log.info("Prefetch stats: %s", self.file_system_client.prefetch_cache.stats())
+
+    async def _prefetch_call(self, path: str, method: str) -> Any:
+        """
+        Run a prefetch method of the file system of the path on the prefetch thread pool of its root.
+        """
+        file_system, relative_path = self.file_system_client.resolve(path)
+        executor = self.file_system_client.roots[file_system.root_name].prefetch_executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, getattr(file_system, method), relative_path)
+
+    async def _prefetch_text(self, path: str, generation: int) -> None:
+        """
+        Extract and cache the text of a document.
+        """
+        source = await self._prefetch_call(path, "prefetch_text_source")
+        if source is None:
+            return
+        full_path, version, file_contents, content_type = source
+        await self._wait_until_idle()
+        if generation != self._generation:
+            return
+        text = await self.text_extraction_pool.extract(path, file_contents, content_type, background=True)
+        if text is not None:
+            self.file_system_client.prefetch_cache.put("text", full_path, version, text, len(text))
+
+    async def _wait_until_idle(self) -> None:
+        """
+        Wait until no other file operation is running.
+        """
+        while self.file_system_client.in_flight > 0:
+            await asyncio.sleep(_IDLE_POLL_INTERVAL)
@@ -0,0 +1,166 @@
+"""Access to one or several file system roots."""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from .config import Config
+from .content_type import ContentType
+from .file_system import FileSystem, SizeLimitKind, SortBy
+from .prefetch import PrefetchCache
+from .models import ArchiveContents, FileMetadata, FolderChanges, FolderContents, FolderItem
+
+T = TypeVar("T")
+
+class _Root:
+    """
+    A file system root with its own I/O thread pool, and a separate small pool for prefetching,
+    so the prefetch never takes the I/O threads of requests.
+    """
+
+    def __init__(self, name: str, config: Config, log: logging.Logger, prefetch_cache: PrefetchCache | None):
+        self.name = name
+        self.config = config
+        self.file_system = FileSystem(config, log, name, prefetch_cache)
+        self.executor = ThreadPoolExecutor(max_workers=max(config.max_io_threads, 1),
+                                           thread_name_prefix=f"io-{name or 'default'}")
+        self.prefetch_executor = None
+        if config.prefetch_enabled:
+            self.prefetch_executor = ThreadPoolExecutor(max_workers=max(config.prefetch_workers, 1),
+                                                        thread_name_prefix=f"prefetch-{name or 'default'}")
+
+class FileSystemRoots:
+    """
+    Dispatches file system calls to roots. With a single root paths are relative to it.
+    With named roots paths are given as "name:/dir" and the empty path lists the roots.
+    Each root has its own limits, exclusions and I/O thread pool, so a slow root does not
+    block calls to other roots.
+    """
+
+    def __init__(self, config: Config, log: logging.Logger):
+        self.config = config
+        self.log = log
+        self.roots: dict[str, _Root] = {}
+        # Number of running file system calls. The prefetcher works only when it is 0
+        self.in_flight = 0
+        self.prefetch_cache = PrefetchCache(config, log) if config.prefetch_enabled else None
+
+        named_roots = config.get_roots()
+        if named_roots:
+            for name, path in named_roots.items():
+                self.roots[name] = _Root(name, config.for_root(name, path), log, self.prefetch_cache)
+        else:
+            self.roots[""] = _Root("", config, log, self.prefetch_cache)
+
+    @property
+    def is_multi_root(self) -> bool:
+        """
+        Check if named roots are used.
+        """
+        return "" not in self.roots
+
+    def resolve(self, path: str) -> tuple[FileSystem, str]:
+        """
+        Get the file system of a root and the path relative to it.
+        """
+        if not self.is_multi_root:
+            return self.roots[""].file_system, path
+
+        name, separator, relative_path = path.partition(":")
+        if not separator or name not in self.roots:
+            raise ValueError(f"Path must start with a root name, e.g. 'root:/dir'. "
+                             f"Available roots: {', '.join(self.roots)}")
+        return self.roots[name].file_system, relative_path.lstrip("/\\")
+
+    def config_for(self, path: str) -> Config:
+        """
+        Get the configuration of the root the path belongs to.
+        """
+        file_system, _ = self.resolve(path)
+        return file_system.config
+
+    async def folder_contents(self, path: str, sort_by: SortBy | None = None, descending: bool = False,
+                              name_glob: str = "", min_size: int = 0, modified_since: float | None = None,
+                              limit: int | None = None) -> FolderContents:
+        """
+        Get the contents of a folder. With named roots the empty path lists the roots.
+        """
+        if self.is_multi_root and path in ("", "/", "\\"):
+            return FolderContents(folder=FolderItem(name="", path=""),
+                                  subfolders=[FolderItem(name=name, path=f"{name}:/") for name in self.roots])
+
+        return await self._run(path, lambda fs, relative_path: fs.folder_contents(
+            relative_path, sort_by=sort_by, descending=descending, name_glob=name_glob,
+            min_size=min_size, modified_since=modified_since, limit=limit))
+
+    async def changes_since(self, path: str, since: str = "", full_rescan: bool = False) -> FolderChanges:
+        """
+        Get files created, modified or deleted in a folder tree since a previous call.
+        """
+        return await self._run(path, lambda fs, relative_path: fs.changes_since(relative_path, since, full_rescan))
+
+    async def get_metadata(self, path: str) -> FileMetadata:
+        """
+        Get the metadata of a file.
+        """
+        return await self._run(path, FileSystem.get_metadata)
+
+    async def get_file_content(self, path: str, size_limit_kind: SizeLimitKind = SizeLimitKind.RETURN) -> bytes:
+        """
+        Get the content of a file as bytes.
+        """
+        return await self._run(path, lambda fs, relative_path: fs.get_file_content(relative_path, size_limit_kind))
+
+    async def get_file_content_as_string(self, path: str,
+                                         size_limit_kind: SizeLimitKind = SizeLimitKind.RETURN) -> str:
+        """
+        Get the content of a file as a string.
+        """
+        return await self._run(path, lambda fs, relative_path: fs.get_file_content_as_string(
+            relative_path, size_limit_kind))
+
+    async def get_prefetched_text(self, path: str) -> str | None:
+        """
+        Get the text extracted from a file by the prefetcher, if it is still valid.
+        """
+        return await self._run(path, FileSystem.get_prefetched_text)
+
+    async def get_content_type(self, path: str) -> ContentType:
+        """
+        Get the content type of a file.
+        """
+        return await self._run(path, FileSystem.get_content_type)
+
+    async def get_image_file_format(self, path: str) -> str:
+        """
+        Get the image file format from the file header.
+        """
+        return await self._run(path, FileSystem.get_image_file_format)
+
+    async def archive_contents(self, path: str) -> ArchiveContents:
+        """
+        Get the list of members of a ZIP archive.
+        """
+        return await self._run(path, FileSystem.archive_contents)
+
+    async def get_archive_member_content(self, path: str, member: str,
+                                         size_limit_kind: SizeLimitKind = SizeLimitKind.RETURN) -> bytes:
+        """
+        Get the content of a ZIP archive member as bytes.
+        """
+        return await self._run(path, lambda fs, relative_path: fs.get_archive_member_content(
+            relative_path, member, size_limit_kind))
+
+    async def _run(self, path: str, call: Callable[[FileSystem, str], T]) -> T:
+        """
+        Run a file system call in the I/O thread pool of the root the path belongs to.
+        """
+        file_system, relative_path = self.resolve(path)
+        root = self.roots[file_system.root_name]
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        try:
+            return await loop.run_in_executor(root.executor, functools.partial(call, file_system, relative_path))
+        finally:
+            self.in_flight -= 1
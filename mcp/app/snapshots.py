@@ -0,0 +1,99 @@
+"""Persisted folder snapshots used to compute changes between calls."""
+import glob
+import hashlib
+import json
+import os
+import re
+import uuid
+
+from .config import Config
+
+TOKEN_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+class SnapshotStore:
+    """
+    Stores folder tree snapshots on the local disk. Each snapshot is identified by a token.
+    A snapshot maps folder paths to the folder mtime and the (size, mtime) of its files.
+    Snapshots are kept in a subfolder per tracked path, and the count limit applies per path.
+    Snapshots contain the file listings of the share, so the folders are readable only by
+    the current user, by default in the user's home folder.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.folder = config.state_folder or os.path.join(os.path.expanduser("~"), ".nasuni_mcp", "state")
+
+    @staticmethod
+    def is_token(value: str) -> bool:
+        """
+        Check if the value looks like a snapshot token.
+        """
+        return TOKEN_PATTERN.fullmatch(value) is not None
+
+    def load(self, token: str) -> dict:
+        """
+        Load a snapshot by its token.
+        """
+        if not self.is_token(token):
+            raise ValueError(f"Invalid token: {token}")
+        self._ensure_folder(self.folder)
+        found = glob.glob(os.path.join(glob.escape(self.folder), "*", f"{token}.json"))
+        try:
+            with open(found[0], "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (IndexError, FileNotFoundError) as e:
+            raise ValueError(f"Unknown or expired token: {token}") from e
+
+    def save(self, snapshot: dict) -> str:
+        """
+        Save a snapshot and return its token. Old snapshots of the same path above
+        the configured count are removed.
+        """
+        path_folder = self._path_folder(snapshot["path"])
+        self._ensure_folder(self.folder)
+        self._ensure_folder(path_folder)
+        token = uuid.uuid4().hex
+        snapshot_path = os.path.join(path_folder, f"{token}.json")
+        with open(snapshot_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(snapshot_path + ".tmp", snapshot_path)
+        self._prune(path_folder)
+        return token
+
+    def _prune(self, path_folder: str):
+        """
+        Remove the oldest snapshots of a path if there are more than max_change_snapshots.
+        """
+        if not self.config.max_change_snapshots:
+            return
+        snapshots = [entry for entry in os.scandir(path_folder)
+                     if entry.is_file() and entry.name.endswith(".json")]
+        if len(snapshots) <= self.config.max_change_snapshots:
+            return
+        snapshots.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in snapshots[:len(snapshots) - self.config.max_change_snapshots]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _ensure_folder(folder: str):
+        """
+        Create a folder accessible only by the current user. A folder owned by another user is refused.
+        """
+        os.makedirs(folder, mode=0o700, exist_ok=True)
+        if not hasattr(os, "getuid"):
+            # on Windows the default location is in the user profile, which is already private
+            return
+        stat = os.lstat(folder)
+        if stat.st_uid != os.getuid():
+            raise ValueError(f"State folder {folder} is owned by another user")
+        if stat.st_mode & 0o077:
+            os.chmod(folder, 0o700)
+
+    def _path_folder(self, path: str) -> str:
+        """
+        Build the folder of the snapshots of a tracked path (including its root name).
+        """
+        return os.path.join(self.folder, hashlib.sha1(path.encode("utf-8")).hexdigest())
@@ -0,0 +1,171 @@
+"""Text extraction in worker processes."""
+import logging
+import os
+import pickle
+import subprocess
+import sys
+import threading
+
+import anyio
+
+from .config import Config
+from .content_type import ContentType
+
+# Folder containing the app package, the workers are started from it
+_PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Max time for a worker process to start and load the parsers, in seconds
+_STARTUP_TIMEOUT = 60
+
+class _Worker:
+    """
+    A worker process. Requests and responses are pickled objects on its stdin and stdout.
+    """
+
+    def __init__(self, memory_limit: int):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "app.text_extraction_worker", str(memory_limit)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=_PACKAGE_PARENT)
+        self.ready = False
+
+    def is_alive(self) -> bool:
+        """
+        Check if the worker process is running.
+        """
+        return self.process.poll() is None
+
+    def send(self, message: tuple) -> None:
+        """
+        Send a request to the worker.
+        """
+        pickle.dump(message, self.process.stdin)
+        self.process.stdin.flush()
+
+    def recv(self) -> tuple:
+        """
+        Wait for a response of the worker.
+        """
+        return pickle.load(self.process.stdout)
+
+    def kill(self) -> None:
+        """
+        Kill the worker process.
+        """
+        self.process.kill()
+        self.process.wait()
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                # data left in the buffer cannot be written to a dead process
+                pass
+
+class TextExtractionPool:
+    """
+    Pool of worker processes to extract text from documents.
+    Each call is limited by the wall clock time and the worker memory. Workers which time out,
+    crash or whose call was cancelled are killed and replaced by new ones.
+    If no workers are configured, texts are extracted in the server process.
+    Background calls never wait for a worker, always leave one worker free for other calls and
+    are skipped if there are no workers.
+    """
+
+    def __init__(self, config: Config, log: logging.Logger):
+        self.config = config
+        self.log = log
+        self._idle: list[_Worker | None] = [None] * config.text_extraction_workers
+        self._lock = threading.Lock()
+        self._semaphore: anyio.Semaphore | None = None
+
+    async def extract(self, file_name: str, file_contents: bytes, content_type: ContentType | None = None,
+                      background: bool = False) -> str | None:
+        """
+        Extract text from a file in a worker process.
+        In background mode None is returned if no worker is free, or if there are no workers
+        at all, so the background work never extracts in the server process.
+        """
+        if not self.config.text_extraction_workers:
+            if background:
+                return None
+            from .utils import extract_text_from_file
+            return await anyio.to_thread.run_sync(extract_text_from_file, file_name, file_contents, content_type)
+
+        if self._semaphore is None:
+            self._semaphore = anyio.Semaphore(self.config.text_extraction_workers)
+
+        if background:
+            reserved = 1 if self.config.text_extraction_workers > 1 else 0
+            if self._semaphore.value <= reserved:
+                return None
+            self._semaphore.acquire_nowait()
+        else:
+            await self._semaphore.acquire()
+
+        try:
+            worker = self._acquire()
+            healthy = False
+            try:
+                await self._wait_ready(worker)
+                # the time limit starts when the worker is ready, so a worker start is not counted
+                with anyio.fail_after(self.config.text_extraction_timeout or None):
+                    await anyio.to_thread.run_sync(
+                        worker.send, (file_name, file_contents, content_type.value if content_type else None),
+                        abandon_on_cancel=True)
+                    ok, result = await anyio.to_thread.run_sync(worker.recv, abandon_on_cancel=True)
+                healthy = True
+            except TimeoutError as e:
+                self.log.warning("Text extraction from %s timed out, worker is killed", file_name)
+                raise ValueError(f"Text extraction from {file_name} timed out.") from e
+            except (EOFError, OSError, pickle.UnpicklingError) as e:
+                self.log.warning("Text extraction worker for %s exited unexpectedly", file_name)
+                raise ValueError(f"Text extraction from {file_name} failed: worker process exited.") from e
+            finally:
+                # a worker in unknown state (timeout, crash, cancellation) is not reused
+                if not healthy:
+                    worker.kill()
+                    worker = None
+                self._release(worker)
+        finally:
+            self._semaphore.release()
+
+        if not ok:
+            raise ValueError(result)
+        return result
+
+    async def _wait_ready(self, worker: _Worker) -> None:
+        """
+        Wait until a new worker has loaded the parsers.
+        """
+        if worker.ready:
+            return
+        try:
+            with anyio.fail_after(_STARTUP_TIMEOUT):
+                await anyio.to_thread.run_sync(worker.recv, abandon_on_cancel=True)
+        except TimeoutError as e:
+            raise ValueError("Text extraction worker did not start.") from e
+        worker.ready = True
+
+    def _acquire(self) -> _Worker:
+        """
+        Take an idle worker, starting a new process if needed.
+        """
+        with self._lock:
+            worker = self._idle.pop()
+        if worker is not None and not worker.is_alive():
+            worker.kill()
+            worker = None
+        if worker is None:
+            try:
+                worker = _Worker(self.config.text_extraction_memory_limit)
+            except Exception:
+                self._release(None)
+                raise
+        return worker
+
+    def _release(self, worker: _Worker | None) -> None:
+        """
+        Return a worker to the pool. None means the worker is to be started on the next use.
+        """
+        with self._lock:
+            self._idle.append(worker)
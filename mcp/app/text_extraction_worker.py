@@ -0,0 +1,59 @@
+"""Entry point of a text extraction worker process.
+Started as `python -m app.text_extraction_worker <memory_limit>`. Requests and responses
+are pickled objects on stdin and stdout.
+"""
+import os
+import pickle
+import sys
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+def main() -> None:
+    """
+    Extract texts until stdin is closed.
+    """
+    memory_limit = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    if resource is not None and memory_limit:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        except (ValueError, OSError):
+            # some platforms (e.g. macOS) do not support this limit
+            pass
+
+    # stdout is reserved for responses, anything printed by the parsers goes to stderr
+    output = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    requests = sys.stdin.buffer
+
+    # the parsers are imported after the memory limit is set, the app package itself
+    # imports only the configuration
+    from app.content_type import ContentType
+    from app.utils import extract_text_from_file
+
+    _send(output, (True, "ready"))
+    while True:
+        try:
+            file_name, file_contents, content_type = pickle.load(requests)
+        except EOFError:
+            return
+        try:
+            text = extract_text_from_file(file_name, file_contents,
+                                          ContentType(content_type) if content_type else None)
+            _send(output, (True, text))
+        except MemoryError:
+            _send(output, (False, "Text extraction ran out of memory"))
+        except Exception as e:
+            _send(output, (False, str(e)))
+
+def _send(output, message: tuple) -> None:
+    """
+    Write a response to the server.
+    """
+    pickle.dump(message, output)
+    output.flush()
+
+if __name__ == "__main__":
+    main()
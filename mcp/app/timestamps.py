@@ -0,0 +1,17 @@
+"""Parsing of timestamps given by clients."""
+from datetime import datetime
+
+def parse_timestamp(value: str) -> float:
+    """
+    Parse a timestamp given either as a Unix timestamp or as an ISO 8601 date/time string.
+    Date/time strings without a timezone are treated as local time.
+    """
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError as e:
+        raise ValueError(f"Invalid timestamp: {value}") from e
@@ -5,20 +5,27 @@ from docx import Document
 from PIL import Image as PILImage
 
 from .config import Config
+from .content_type import HEADER_SIZE, TEXT_EXTRACTION_TYPES, ContentType, detect_content_type
 
-def extract_text_from_file(file_name: str, file_contents: bytes) -> str:
+def extract_text_from_file(file_name: str, file_contents: bytes, content_type: ContentType | None = None) -> str:
     """
     Extract text from a file. Is used to convert non plain text files to a text.
-    Supports: pdf, docx
+    Supports: pdf, docx. The type is detected from the file header if not given.
     """
 
-    if file_name.endswith(".pdf"):
+    if content_type is None:
+        content_type = detect_content_type(file_contents[:HEADER_SIZE], io.BytesIO(file_contents))
+
+    if content_type not in TEXT_EXTRACTION_TYPES:
+        raise ValueError(f"Text can not be extracted from {file_name} (detected type: {content_type.value}).")
+
+    if content_type == ContentType.PDF:
         reader = PdfReader(io.BytesIO(file_contents))
         text = ""
         for page in reader.pages:
             text += page.extract_text() + "\n"
         return text
-    elif file_name.endswith(".docx"):
+    elif content_type == ContentType.DOCX:
         doc = Document(io.BytesIO(file_contents))
         text = []
         
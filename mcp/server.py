@@ -4,108 +4,215 @@ import os
 import sys
 from mcp.server.fastmcp import FastMCP, Image
 from app.config import Config
-from app import init_logger, get_file_system_client
+from app import init_logger, get_file_system_client, get_prefetcher, get_text_extraction_pool
 from app.utils import (
-    extract_text_from_file, 
     get_image_thumb,
     verify_length_is_not_too_large_to_return
 )
-from app.file_system import FolderContents, FileMetadata, SizeLimitKind
+from app.timestamps import parse_timestamp
+from app.content_type import (
+    ContentType,
+    HEADER_SIZE,
+    TEXT_EXTRACTION_TYPES,
+    detect_content_type,
+    image_format as get_image_format
+)
+from app.file_system import ArchiveContents, FolderChanges, FolderContents, FileMetadata, SizeLimitKind, SortBy
 
 config = Config()
 log = init_logger(config)
 
 file_system_client = get_file_system_client(config, log)
+text_extraction_pool = get_text_extraction_pool(config, log)
+prefetcher = get_prefetcher(config, log, file_system_client, text_extraction_pool)
 
 mcp = FastMCP("Nasuni File Storage Server")
 
 @mcp.tool()
-def folder_contents(path: str = "") -> FolderContents:
+async def folder_contents(path: str = "",
+                          sort_by: str = "",
+                          order: str = "asc",
+                          name_glob: str = "",
+                          min_size: int = 0,
+                          modified_since: str = "",
+                          limit: int = 0) -> FolderContents:
     """
     Returns list of files and sub folders by the folder from SMB share.
     Accepts path to the folder. If the path is empty, it returns the root folder contents.
+    If several roots are configured, the empty path returns the list of roots.
     The path is relative to the root folder. Names are delimited with '/'.
+    Without other arguments only the first scanned items are returned, in no particular order.
+    To get e.g. the latest or the largest files use the selection arguments. The whole folder
+    is scanned then and only the matching files are returned:
+    sort_by - one of "name", "size", "mtime". order - "asc" or "desc".
+    name_glob - shell style pattern for file names, e.g. "*.pdf" (case insensitive).
+    min_size - minimum file size in bytes.
+    modified_since - Unix timestamp or ISO 8601 date/time; only files modified at or after it are returned.
+    limit - maximum number of files to return, at most the configured scan limit. 0 means the scan limit.
+    Filters apply to files only, sub folders are always listed.
     """
 
-    return file_system_client.folder_contents(path)
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Invalid order: {order}. Expected 'asc' or 'desc'")
+
+    contents = await file_system_client.folder_contents(
+        path,
+        sort_by=SortBy(sort_by) if sort_by else None,
+        descending=order == "desc",
+        name_glob=name_glob,
+        min_size=min_size,
+        modified_since=parse_timestamp(modified_since) if modified_since else None,
+        limit=limit if limit > 0 else None)
+
+    # warm the likely next reads while the client is processing the listing
+    prefetcher.schedule(contents)
+
+    return contents
 
 @mcp.tool()
-def file_metadata(path: str) -> FileMetadata:
+async def changes_since(path: str = "", since: str = "", full_rescan: bool = False) -> FolderChanges:
+    """
+    Returns files created, modified or deleted in the folder and its sub folders since a previous call.
+    since - the token returned by a previous call for the same path, or a Unix timestamp / ISO 8601 date/time.
+    If since is empty, the tracking starts and only a token is returned.
+    Every call returns a new token to be used for the next call.
+    With a timestamp all files modified at or after it are returned as modified; deletions are not known.
+    With a token, folders which were not changed are not listed again. Files rewritten in place
+    do not always change their folder, so pass full_rescan=True to check every folder.
+    The path is relative to the root folder. Names are delimited with '/'.
+    """
+    return await file_system_client.changes_since(path, since, full_rescan)
+
+@mcp.tool()
+async def file_metadata(path: str) -> FileMetadata:
     """
     Returns metadata for a file from SMB share.
     This represents a file size and detects if a file can be treated 
     as image or a text can be extracted from the file.
     The path is relative to the root folder. Names are delimited with '/'.
     """
-    return file_system_client.get_metadata(path)
+    return await file_system_client.get_metadata(path)
 
 
 @mcp.tool()
-def file_contents(path: str) -> str:
+async def file_contents(path: str) -> str:
     """
     Download file from the SMB share. Returns a file contents converted to a string.
-    Files with binary contents can have unexpected results.
-    This method works the best for text or hypertext files.
+    This method works only for text or hypertext files. Binary files are rejected.
     If a file is binary, or contains non plain text content, 
-    it is recommended to use file_contents_base64() method, which works better for binary files. 
-    Or use image_file_contents() method for images of supported formats.
+    use file_contents_base64() method, file_file_contents_as_text() for pdf and docx files,
+    or image_file_contents() method for images of supported formats.
     The path is relative to the root folder. Names are delimited with '/'.
     """
-    return file_system_client.get_file_content_as_string(path)
+    return await file_system_client.get_file_content_as_string(path)
 
 @mcp.tool()
-def file_contents_base64(path: str) -> str:
+async def file_contents_base64(path: str) -> str:
     """
     Download file from the SMB share. Returns a file contents encoded as base64.
     This works the best with binary files.
     The path is relative to the root folder. Names are delimited with '/'.
     """
-    contents = file_system_client.get_file_content(path)
+    contents = await file_system_client.get_file_content(path)
     encoded_contents = base64.b64encode(contents).decode("utf-8")
     return encoded_contents
     
 @mcp.tool()
-def image_file_contents(path: str, thumb_width: int = 0) -> Image:
+async def image_file_contents(path: str, thumb_width: int = 0, member: str = "") -> Image:
     """
     Download image file from the SMB share. Returns an Image object.
     This works only for image files of types png and jpeg.
     The path is relative to the root folder. Names are delimited with '/'.
     The image can be resized by specifying the thumb_width parameter. If thumb_width is greater than 0,
     the image will be resized to the specified width while maintaining the aspect ratio.
+    If member is set, the path must be a ZIP archive and the image is read from the archive member
+    with this name (see archive_contents()).
     """
 
-    # This will throw an exception if the format is not supported
-    image_format = file_system_client.get_image_file_format(path)
-
     # Read the file depending on the limit. If we need thumb then we can read bigger file
     limit_kind = SizeLimitKind.READ if thumb_width > 0 else SizeLimitKind.RETURN
 
-    image_data = file_system_client.get_file_content(path, limit_kind)
+    if member:
+        image_data = await file_system_client.get_archive_member_content(path, member, limit_kind)
+        # This will throw an exception if the format is not supported
+        image_format = get_image_format(detect_content_type(image_data[:HEADER_SIZE]))
+    else:
+        # This will throw an exception if the format is not supported. Only the file header is read
+        image_format = await file_system_client.get_image_file_format(path)
+        image_data = await file_system_client.get_file_content(path, limit_kind)
 
     if thumb_width > 0:
         # Resize the image to the specified thumbnail width
         image_data = get_image_thumb(image_data, thumb_width, image_format)
         # final check of the length
-        verify_length_is_not_too_large_to_return(len(image_data), config)
+        verify_length_is_not_too_large_to_return(len(image_data), file_system_client.config_for(path))
 
     return Image(data=image_data, format=image_format)
 
 @mcp.tool()
-def file_file_contents_as_text(path: str) -> str:
+async def archive_contents(path: str) -> ArchiveContents:
+    """
+    Returns list of members of a ZIP based archive file from SMB share (zip, docx, xlsx, pptx, jar, etc.).
+    Only the archive directory is read, so large archives can be inspected.
+    Use archive_member() to get a text of a member, or image_file_contents() with the member argument for images.
+    The path is relative to the root folder. Names are delimited with '/'.
+    """
+    return await file_system_client.archive_contents(path)
+
+@mcp.tool()
+async def archive_member(path: str, member: str) -> str:
+    """
+    Retrieve a member of a ZIP based archive file from SMB share and extract text data from it.
+    Only the requested member is read from the archive.
+    For pdf and docx members the text is extracted, other members are returned as a string.
+    The path is relative to the root folder. Names are delimited with '/'.
+    The member is a full member name as returned by archive_contents().
+    """
+
+    member_contents = await file_system_client.get_archive_member_content(path, member, SizeLimitKind.READ)
+    text = await text_extraction_pool.extract(member, member_contents)
+
+    verify_length_is_not_too_large_to_return(len(text), file_system_client.config_for(path))
+
+    return text
+
+@mcp.tool()
+async def file_file_contents_as_text(path: str) -> str:
     """
     Retrieve file from the SMB share and extract text data from it.
     It is supported for pdf and docx files.
-    For other files it will return the file content as a string same as file_contents() method.
+    For other text files it will return the file content as a string same as file_contents() method.
+    Other binary files are rejected.
     The path is relative to the root folder. Names are delimited with '/'.
     """
 
-    text = extract_text_from_file(path, 
-                                  file_system_client.get_file_content(path, SizeLimitKind.READ)
-                                  )
+    # Only the file header is read to detect the type, so unsupported files are rejected early
+    content_type = await file_system_client.get_content_type(path)
+    if content_type not in TEXT_EXTRACTION_TYPES:
+        raise ValueError(f"Text can not be extracted from {path} (detected type: {content_type.value}).")
+
+    if content_type == ContentType.TEXT:
+        # plain text is only decoded, in the server process and within the return limit
+        return await file_system_client.get_file_content_as_string(path)
+
+    text = await file_system_client.get_prefetched_text(path)
+    if text is None:
+        file_contents = await file_system_client.get_file_content(path, SizeLimitKind.READ)
+        text = await text_extraction_pool.extract(path, file_contents, content_type)
     
-    verify_length_is_not_too_large_to_return(len(text), config)
+    verify_length_is_not_too_large_to_return(len(text), file_system_client.config_for(path))
     
     return text
 
+@mcp.resource("stats://prefetch")
+async def prefetch_stats() -> dict:
+    """
+    Returns the prefetch statistics: prefetched entries, hits, misses and the hit rate per kind.
+    Empty if prefetching is disabled.
+    """
+    if file_system_client.prefetch_cache is None:
+        return {}
+    return file_system_client.prefetch_cache.stats()
+
 if __name__ == "__main__":
     mcp.run()